@@ -0,0 +1,89 @@
+import io
+import logging
+import logging.handlers
+import os
+import threading
+
+LOG_BUFFER_SIZE = 65536
+LOG_FLUSH_INTERVAL = 0.2
+
+
+class BufferedStreamHandler(logging.StreamHandler):
+    """StreamHandler that batches records into a 64 KiB `io.BufferedWriter`.
+
+    The default StreamHandler flushes after every record, costing one
+    `write()` syscall per log line. This handler writes the file descriptor
+    `fd` (stderr by default) through its own buffer and only flushes:
+    - when a record at `flush_level` or above is emitted,
+    - every `flush_interval` seconds from a background thread,
+    - and on `close()`, which `logging.shutdown()` calls.
+    """
+
+    def __init__(
+        self,
+        fd: int = 2,
+        buffer_size: int = LOG_BUFFER_SIZE,
+        flush_interval: float = LOG_FLUSH_INTERVAL,
+        flush_level: int = logging.WARNING,
+    ):
+        raw = io.FileIO(os.dup(fd), "w")
+        stream = io.TextIOWrapper(
+            io.BufferedWriter(raw, buffer_size=buffer_size),
+            encoding="utf-8",
+            write_through=True,
+        )
+        super().__init__(stream)
+        self._flush_level = flush_level
+        self._closing = threading.Event()
+        self._flusher = threading.Thread(
+            target=self.__flush_periodically,
+            args=(flush_interval,),
+            name="log-flusher",
+            daemon=True,
+        )
+        self._flusher.start()
+
+    def emit(self, record: logging.LogRecord):
+        """Write the formatted record to the buffer, flushing only on WARN+."""
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+            if record.levelno >= self._flush_level:
+                self.flush()
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+    def __flush_periodically(self, interval: float):
+        """Flush the buffer every `interval` seconds until closed."""
+        while not self._closing.wait(interval):
+            self.flush()
+
+    def close(self):
+        """Stop the flusher thread, flush what is left and close the stream."""
+        self._closing.set()
+        if self._flusher is not threading.current_thread():
+            self._flusher.join()
+        self.acquire()
+        try:
+            if self.stream:
+                self.stream.flush()
+                self.stream.close()
+                self.stream = None
+        finally:
+            self.release()
+        super().close()
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves formatting to the QueueListener thread.
+
+    The stock `prepare()` formats every record on the logging thread so it
+    can be pickled. Records here only cross threads, so they are enqueued
+    as they are: the calling thread pays for the enqueue alone. Arguments
+    are then formatted later, so they must not be mutated after logging.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Return `record` unchanged; the listener's handlers format it."""
+        return record
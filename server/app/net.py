@@ -1,188 +1,598 @@
+import collections
+import itertools
 import logging
+import multiprocessing
+import selectors
 import signal
 import socket
+import struct
 import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from typing import Optional
 
 from app import protocol, service
 
+_log = logging.getLogger(__name__)
+
+RECV_BUFFER_SIZE = 65536
+SOCKET_BUFFER_SIZE = 262144
+DEFER_ACCEPT_SECONDS = 30
+MIN_LISTEN_BACKLOG = 128
+# Bound on accepts per listener event, so other sockets are not starved.
+MAX_ACCEPTS_PER_EVENT = 64
+SOMAXCONN_PATH = "/proc/sys/net/core/somaxconn"
+# Max buffers per sendmsg() call (Linux UIO_MAXIOV).
+MAX_IOV = 1024
+# Byte written to the wakeup socket by worker callbacks; 0 is no signal number.
+_WAKEUP_BYTE = b"\0"
+# SO_LINGER {on, 0s}: close() resets the connection and drops queued data.
+_LINGER_ABORT = struct.pack("ii", 1, 0)
+
+# BETS_RECV_* responses carry no payload: frame them once and reuse the bytes.
+_SUCCESS_BYTES = protocol.BetsRecvSuccess().to_bytes()
+_FAIL_BYTES = protocol.BetsRecvFail().to_bytes()
+# Most agencies have no winners: their WINNERS frame is built once too.
+_EMPTY_WINNERS_FRAME = protocol.Winners([]).to_buffers()
+
+
+class Connection:
+    """Per-connection state kept by the reactor.
+
+    - `inbuf` is the `protocol.BufferedSock` wrapping the socket: a
+      receive buffer taken from the server's pool, reused for the whole life
+      of the connection and returned on close, from which frames are parsed
+      in place.
+    - `outbuf` holds the buffers not yet accepted by the kernel, in order; it
+      is filled through `sendall` with pre-built frames, and drained with
+      scatter-gather `sendmsg` calls.
+    - `ip` is the peer address, captured once at accept time for logging.
+    - `agency_id` is set once the agency sends FINISHED.
+    - `need` is how many buffered bytes the next frame requires, so partial
+      frames are not re-parsed on every readable event.
+    - `reading` tells whether the connection still wants EVENT_READ.
+    - `close_after_flush` closes the socket once `outbuf` is drained.
+    """
+
+    def __init__(self, sock: socket.socket, ip: str, pool: protocol.BufferPool):
+        self.sock = sock
+        self.ip = ip
+        self.fd = sock.fileno()
+        self.inbuf = protocol.BufferedSock(sock, RECV_BUFFER_SIZE, pool)
+        self.outbuf: collections.deque = collections.deque()
+        self.agency_id = None
+        self.need = protocol.HEADER_LENGTH
+        self.events = 0
+        self.reading = True
+        self.close_after_flush = False
+        self.closed = False
+
+    def sendall(self, data) -> None:
+        """Queue `data` (not copied, so it must not be mutated) for writing."""
+        if data:
+            self.outbuf.append(data)
+
+    def consume(self, nsent: int) -> None:
+        """Drop the first `nsent` queued bytes, already taken by the kernel."""
+        while nsent:
+            head = self.outbuf[0]
+            if nsent < len(head):
+                self.outbuf[0] = memoryview(head)[nsent:]
+                return
+            nsent -= len(head)
+            self.outbuf.popleft()
+
 
 class Server:
     def __init__(self, port, listen_backlog, clients_amount):
-        """Initialize listening socket and concurrency primitives.
-
-        - Creates and binds the TCP listening socket.
-        - `_stop` is a process-wide shutdown flag (set by SIGTERM).
-        - `_finished` is a Barrier with the expected number of clients/agencies;
-          it is used to block FINISHED handlers until all are in.
-        - `_winners` holds the computed winners grouped by agency.
-        - `_raffle_done` is a latch Event set once the raffle is computed.
-        - `_raffle_lock` ensures the raffle is computed exactly once.
-        - `_storage_lock` serializes access to storage during batch persistence.
-        - `_threads` keeps track of per-connection worker threads.
+        """Initialize the non-blocking listening socket and reactor state.
+
+        - Creates, tunes (see `__configure_listener`), binds and registers the
+          TCP listening socket in `_sel` (epoll on Linux).
+        - `_running` is cleared when SIGTERM is read from the wakeup socket,
+          which stops the reactor loop.
+        - `_conns` maps each client fd to its `Connection` state, and
+          `_buffers` pools their receive buffers, so a new connection reuses
+          the memory of a closed one.
+        - `_storage` is the `service.BetsWriter` thread running the blocking
+          disk writes off the reactor thread, in FIFO order; the reactor only
+          enqueues batches, and the writer appends every batch queued since
+          its last write at once, on a file descriptor kept open for the
+          server lifetime. Its thread is only started by `run`, so a failure
+          in here cannot leave it blocking the process exit.
+        - `_raffle_pool` is a single-process pool for `compute_winners`, which
+          parses every stored bet and would otherwise hold the GIL.
+        - Writer and pool results come back through `_completed`, and a byte on the
+          `_wakeup_w`/`_wakeup_r` socketpair wakes up `select()`. The same
+          socketpair is the signal wakeup fd, so SIGTERM arrives as a
+          readable event too.
+        - `_finished` holds, at index `agency_id - 1`, the connection of each
+          agency that already sent FINISHED; `_finished_count` counts them and
+          once it reaches `_clients_amount` the raffle is computed.
+        - `_winners` holds the computed winners grouped by agency, and
+          `_winner_frames` their serialized WINNERS frames.
+        - `_handlers` are the inbound message handlers, indexed by opcode.
         """
         self._server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.__configure_listener(self._server_socket)
         self._server_socket.bind(("", port))
-        self._server_socket.listen(listen_backlog)
-        self._stop = threading.Event()
-        self._finished = threading.Barrier(int(clients_amount))
+        self._server_socket.listen(self.__effective_backlog(listen_backlog))
+        self._server_socket.setblocking(False)
+        self._sel = selectors.DefaultSelector()
+        self._sel.register(
+            self._server_socket, selectors.EVENT_READ, self.__accept_new_connection
+        )
+        self._wakeup_r, self._wakeup_w = socket.socketpair()
+        self._wakeup_r.setblocking(False)
+        self._wakeup_w.setblocking(False)
+        self._sel.register(self._wakeup_r, selectors.EVENT_READ, self.__run_completed)
+        self._completed: collections.deque = collections.deque()
+        self._storage = service.BetsWriter()
+        self._raffle_pool = ProcessPoolExecutor(
+            max_workers=1, mp_context=multiprocessing.get_context("spawn")
+        )
+        self._conns: dict[int, Connection] = {}
+        self._buffers = protocol.BufferPool(RECV_BUFFER_SIZE)
+        self._running = True
+        self._clients_amount = int(clients_amount)
+        self._finished: list[Optional[Connection]] = [None] * self._clients_amount
+        self._finished_count = 0
         self._winners: dict[int, list[str]] = {}
-        self._raffle_lock = threading.Lock()
-        self._storage_lock = threading.Lock()
-        self._threads: list[threading.Thread] = []
-        self._raffle_done = threading.Event()
+        self._winner_frames: dict[int, Optional[list]] = {}
+        self._handlers = (self.__on_new_bets, None, None, self.__on_finished)
+
+    @staticmethod
+    def __configure_listener(s: socket.socket):
+        """Tune the listening socket before bind/listen.
+
+        - SO_REUSEADDR/SO_REUSEPORT: fast restarts and kernel load balancing
+          if several server processes share the port.
+        - TCP_DEFER_ACCEPT: the kernel only reports a connection once its
+          first data arrives, saving an accept -> recv wakeup round-trip.
+        - SO_RCVBUF/SO_SNDBUF: larger buffers (inherited by accepted sockets)
+          so whole NEW_BETS batches fit in a single recv.
+        Linux-only options are skipped where the platform lacks them.
+        """
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if hasattr(socket, "SO_REUSEPORT"):
+            s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        if hasattr(socket, "TCP_DEFER_ACCEPT"):
+            s.setsockopt(
+                socket.IPPROTO_TCP, socket.TCP_DEFER_ACCEPT, DEFER_ACCEPT_SECONDS
+            )
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER_SIZE)
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_BUFFER_SIZE)
+
+    @staticmethod
+    def __effective_backlog(listen_backlog: int) -> int:
+        """Raise the configured backlog to MIN_LISTEN_BACKLOG, capped by somaxconn.
+
+        The kernel silently truncates larger values to `net.core.somaxconn`;
+        a tiny backlog drops SYNs when every agency connects at once. When the
+        limit cannot be read (non-Linux), `socket.SOMAXCONN` is used instead.
+        """
+        try:
+            with open(SOMAXCONN_PATH) as f:
+                somaxconn = int(f.read())
+        except (OSError, ValueError):
+            somaxconn = socket.SOMAXCONN
+        return min(max(listen_backlog, MIN_LISTEN_BACKLOG), somaxconn)
 
     def run(self):
-        """Main server loop.
+        """Main reactor loop.
 
-        Installs SIGTERM handler, accepts connections until `_stop` is set,
-        and spawns one worker thread per client. On shutdown:
-        - breaks the accept loop if the listening socket is closed,
-        - joins all worker threads,
-        - and calls `logging.shutdown()` to flush logs.
+        Routes SIGTERM to the wakeup socket (only possible from the main
+        thread; elsewhere the loop is stopped with `stop`), starts the storage
+        writer thread and polls the listening socket and every client socket
+        until `_running` is cleared, dispatching readiness events to
+        `__accept_new_connection`, `__run_completed`, `__handle_readable` and
+        `__handle_writable`; events of a connection closed earlier in the
+        same batch (e.g. by a completion callback) are skipped. On shutdown
+        waits for the storage writer and the raffle pool, then closes every
+        client socket, the selector and the listening socket.
+        Flushing logs is left to whoever configured logging (`main`).
         """
-        signal.signal(signal.SIGTERM, self.__handle_sigterm)
-        while not self._stop.is_set():
+        on_main_thread = threading.current_thread() is threading.main_thread()
+        if on_main_thread:
+            signal.signal(signal.SIGTERM, self.__handle_sigterm)
+            signal.set_wakeup_fd(self._wakeup_w.fileno())
+        self._storage.start()
+        try:
+            while self._running:
+                for key, mask in self._sel.select():
+                    conn = key.data
+                    if not isinstance(conn, Connection):
+                        conn()
+                        continue
+                    if mask & selectors.EVENT_READ and not conn.closed:
+                        self.__handle_readable(conn)
+                    if mask & selectors.EVENT_WRITE and not conn.closed:
+                        self.__handle_writable(conn)
+        finally:
+            if on_main_thread:
+                signal.set_wakeup_fd(-1)
+            self._storage.close()
+            self._raffle_pool.shutdown(wait=True)
+            for conn in list(self._conns.values()):
+                self.__close(conn)
+            self._sel.close()
+            self._server_socket.close()
+            self._wakeup_r.close()
+            self._wakeup_w.close()
+
+    def stop(self):
+        """Stop the reactor loop, as SIGTERM does; safe from any thread."""
+        self.__call_soon_threadsafe(self.__stop)
+
+    def __stop(self):
+        """Clear `_running`, so `run()` returns after the current events."""
+        self._running = False
+
+    def __accept_new_connection(self):
+        """Accept every pending client connection and register it for reading.
+
+        Keeps accepting until the non-blocking listening socket reports
+        EAGAIN (at most MAX_ACCEPTS_PER_EVENT times), so a burst of agencies
+        connecting at once is drained in a single readiness event.
+        Disables Nagle on each accepted socket: responses are tiny frames
+        that must not wait for the peer's delayed ACK. TCP_QUICKACK (Linux)
+        also makes the first batches be acknowledged right away, and
+        SO_KEEPALIVE lets the kernel reap agencies that vanish without a FIN
+        while we wait on them for the raffle. The socket buffer sizes are
+        inherited from the listener.
+        """
+        _log.info("action: accept_connections | result: in_progress")
+        for _ in range(MAX_ACCEPTS_PER_EVENT):
             try:
-                client_sock = self.__accept_new_connection()
-                t = threading.Thread(
-                    target=self.__handle_client_connection, args=(client_sock,)
-                )
-                self._threads.append(t)
-                t.start()
-            except OSError:
-                if self._stop.is_set():
+                c, addr = self._server_socket.accept()
+            except (BlockingIOError, InterruptedError):
+                return
+            _log.info("action: accept_connections | result: success | ip: %s", addr[0])
+            c.setblocking(False)
+            c.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            c.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            if hasattr(socket, "TCP_QUICKACK"):
+                c.setsockopt(socket.IPPROTO_TCP, socket.TCP_QUICKACK, 1)
+            conn = Connection(c, addr[0], self._buffers)
+            self._conns[conn.fd] = conn
+            self.__update_interest(conn)
+
+    def __call_soon_threadsafe(self, callback, *args):
+        """Schedule `callback(*args)` on the reactor thread from any thread."""
+        self._completed.append((callback, args))
+        try:
+            self._wakeup_w.send(_WAKEUP_BYTE)
+        except (BlockingIOError, InterruptedError):
+            pass  # the wakeup pipe is full, so a wakeup is already pending
+
+    def __run_completed(self):
+        """Drain the wakeup socket and run the callbacks posted to the reactor.
+
+        Besides `_WAKEUP_BYTE`, the socket carries the numbers of the signals
+        caught since the last drain (see `signal.set_wakeup_fd`); SIGTERM
+        stops the reactor loop.
+        """
+        try:
+            while True:
+                data = self._wakeup_r.recv(RECV_BUFFER_SIZE)
+                if not data:
                     break
-                raise
-        for t in self._threads:
-            t.join()
-        logging.shutdown()
+                if signal.SIGTERM in data:
+                    self._running = False
+        except (BlockingIOError, InterruptedError):
+            pass
+        while self._completed:
+            callback, args = self._completed.popleft()
+            callback(*args)
 
-    def __accept_new_connection(self):
-        """Accept a single client connection.
+    def __submit(self, executor: Executor, callback, fn, *args):
+        """Run `fn(*args)` on `executor`, then `callback(future)` on the reactor."""
+        future = executor.submit(fn, *args)
+        future.add_done_callback(lambda f: self.__call_soon_threadsafe(callback, f))
+
+    def __handle_readable(self, conn: Connection):
+        """Read available bytes and process every complete frame.
 
-        Blocks in `accept()` until a client connects, logs the remote IP,
-        and returns the connected socket.
+        Receives directly into the connection's `inbuf` and processes all the
+        frames it completes in one pass (see `__process_frames`). Responses
+        queued meanwhile are flushed together at the end. EOF or a socket
+        error closes the connection.
         """
-        logging.info("action: accept_connections | result: in_progress")
-        c, addr = self._server_socket.accept()
-        logging.info(f"action: accept_connections | result: success | ip: {addr[0]}")
-        return c
+        try:
+            nrecv = conn.inbuf.fill()
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as e:
+            _log.error("action: receive_message | result: fail | error: %s", e)
+            self.__close(conn)
+            return
+        if nrecv == 0:
+            self.__close(conn)
+            return
+        if conn.inbuf.buffered() < conn.need:
+            return
+        self.__process_frames(conn)
+        if conn.closed:
+            return
+        self.__flush(conn)
 
-    def __handle_client_connection(self, client_sock):
-        """Per-connection worker.
+    def __process_frames(self, conn: Connection):
+        """Parse and process every complete frame buffered in `inbuf`.
 
-        Repeatedly receives framed messages (`protocol.recv_msg`), logs them,
-        and delegates handling to `__process_msg`. The loop continues until
-        `__process_msg` returns False (connection should close), `_stop` is set,
-        EOF is reached, or a socket/protocol error occurs. Always closes the
-        client socket on exit.
+        Frames are parsed in place by `protocol.recv_msg`, straight from the
+        receive buffer. Invalid frames are logged and skipped: the reader is
+        moved to the end of the frame whatever the parser consumed. An
+        invalid header aborts the connection, since the stream cannot be
+        resynchronized, while a frame with an unknown
+        opcode is discarded as it arrives, without buffering it. When the
+        next frame is incomplete its size is saved in `conn.need`, room for
+        all of it is reserved in `inbuf`, and parsing resumes only once that
+        many bytes are buffered.
         """
-        while not self._stop.is_set():
-            msg = None
+        inbuf = conn.inbuf
+        while conn.reading:
             try:
-                msg = protocol.recv_msg(client_sock)
-                addr = client_sock.getpeername()
-                logging.info(
-                    "action: receive_message | result: success | ip: %s | opcode: %i",
-                    addr[0],
-                    msg.opcode,
+                size = protocol.frame_length(inbuf.peek(protocol.HEADER_LENGTH))
+            except protocol.ProtocolError as e:
+                _log.error("action: receive_message | result: fail | error: %s", e)
+                self.__close(conn, abort=True)
+                return
+            if size == 0:
+                conn.need = protocol.HEADER_LENGTH
+                return
+            opcode = inbuf.peek(1)[0]
+            if not protocol.is_inbound_opcode(opcode):
+                _log.error(
+                    "action: receive_message | result: fail | "
+                    "error: invalid opcode: %d",
+                    opcode,
                 )
-                if not self.__process_msg(msg, client_sock):
-                    break
+                inbuf.discard(size)
+                continue
+            if inbuf.buffered() < size:
+                conn.need = size
+                inbuf.reserve(size)
+                return
+            frame_end = inbuf.pos + size
+            try:
+                msg = protocol.recv_msg(inbuf)
             except protocol.ProtocolError as e:
-                logging.error("action: receive_message | result: fail | error: %s", e)
-            except EOFError:
-                break
-            except OSError as e:
-                logging.error("action: send_message | result: fail | error: %s", e)
-                break
-        client_sock.close()
+                _log.error("action: receive_message | result: fail | error: %s", e)
+                continue
+            finally:
+                inbuf.pos = frame_end
+            _log.info(
+                "action: receive_message | result: success | ip: %s | opcode: %i",
+                conn.ip,
+                msg.opcode,
+            )
+            if not self.__process_msg(msg, conn):
+                conn.reading = False
+
+    def __handle_writable(self, conn: Connection):
+        """Resume writing pending responses once the socket is writable."""
+        self.__flush(conn)
 
-    def __process_msg(self, msg, client_sock) -> bool:
+    def __process_msg(self, msg, conn: Connection) -> bool:
         """Route a decoded message and apply the server-side semantics.
 
         Returns:
           True  -> keep reading more messages on this connection
-          False -> stop the loop and close the connection
+          False -> stop reading; the connection is parked until closed
+
+        Dispatches through `_handlers`, indexed by opcode (`recv_msg` only
+        returns messages with a known opcode).
 
         Semantics:
-        - NEW_BETS: persist the whole batch under `_storage_lock`. If every bet
-          is stored successfully, reply BETS_RECV_SUCCESS and log
-          'apuesta_recibida | success | cantidad'. On any exception, reply
-          BETS_RECV_FAIL and log 'apuesta_recibida | fail | cantidad'.
-        - FINISHED: wait on the `_finished` Barrier. The last thread crossing
-          the barrier triggers the raffle (under `_raffle_lock`) if not done.
-          Once the raffle is done, send the agency's winners.
-        """
-        if msg.opcode == protocol.Opcodes.NEW_BETS:
-            try:
-                with self._storage_lock:
-                    service.store_bets(msg.bets)
-                    for bet in msg.bets:
-                        logging.info(
-                            "action: apuesta_almacenada | result: success | dni: %s | numero: %s",
-                            bet.document,
-                            bet.number,
-                        )
-            except Exception as e:
-                protocol.BetsRecvFail().write_to(client_sock)
-                logging.error(
-                    "action: apuesta_recibida | result: fail | cantidad: %d", msg.amount
-                )
-                return True
-            logging.info(
-                "action: apuesta_recibida | result: success | cantidad: %d",
-                msg.amount,
+        - NEW_BETS: hand the whole batch to the storage worker. Once it is
+          persisted, `__on_bets_stored` queues the reply, so responses keep
+          the request order. If every bet is stored successfully, queue
+          BETS_RECV_SUCCESS and log one aggregated
+          'apuesta_almacenada | success | cantidad' line (per-bet `dni:numero`
+          detail only at DEBUG) plus 'apuesta_recibida | success | cantidad'.
+          On any exception, queue BETS_RECV_FAIL and log
+          'apuesta_recibida | fail | cantidad'.
+        - FINISHED: park the connection. When the last agency sends FINISHED
+          the raffle is queued behind the pending batches, and every parked
+          agency gets its winners once it completes.
+        """
+        return self._handlers[msg.opcode](msg, conn)
+
+    def __on_new_bets(self, msg, conn: Connection) -> bool:
+        """Queue a NEW_BETS batch on the storage writer."""
+        self._storage.submit(
+            msg.bets,
+            lambda error: self.__call_soon_threadsafe(
+                self.__on_bets_stored, conn, msg, error
+            ),
+        )
+        return True
+
+    def __on_finished(self, msg, conn: Connection) -> bool:
+        """Park a FINISHED agency and start the raffle after the last one."""
+        slot = msg.agency_id - 1
+        if not 0 <= slot < self._clients_amount or self._finished[slot]:
+            _log.error(
+                "action: receive_message | result: fail | "
+                "error: unexpected agency: %d",
+                msg.agency_id,
             )
-            protocol.BetsRecvSuccess().write_to(client_sock)
-            return True
-        if msg.opcode == protocol.Opcodes.FINISHED:
-            self._finished.wait()
-            with self._raffle_lock:
-                if not self._raffle_done.is_set():
-                    self.__raffle()
-            self.__send_winners(msg.agency_id, client_sock)
+            self.__close(conn)
             return False
+        conn.agency_id = msg.agency_id
+        self._finished[slot] = conn
+        self._finished_count += 1
+        if self._finished_count == self._clients_amount:
+            self.__raffle()
+        return False
+
+    def __on_bets_stored(self, conn: Connection, msg, error: Optional[Exception]):
+        """Log the outcome of a persisted NEW_BETS batch and queue its reply."""
+        if error is not None:
+            _log.error(
+                "action: apuesta_recibida | result: fail | cantidad: %d", msg.amount
+            )
+            conn.sendall(_FAIL_BYTES)
+            self.__flush(conn)
+            return
+        if _log.isEnabledFor(logging.DEBUG):
+            _log.debug(
+                "action: apuesta_almacenada | result: success | apuestas: %s",
+                ",".join(f"{b.document}:{b.number}" for b in msg.bets),
+            )
+        _log.info(
+            "action: apuesta_almacenada | result: success | cantidad: %d",
+            len(msg.bets),
+        )
+        _log.info(
+            "action: apuesta_recibida | result: success | cantidad: %d",
+            msg.amount,
+        )
+        conn.sendall(_SUCCESS_BYTES)
+        self.__flush(conn)
 
     def __raffle(self):
-        """Compute winners once and signal readiness.
+        """Compute winners in `_raffle_pool` once every pending batch is stored.
 
-        Calls `service.compute_winners()` (pure domain logic), stores the result
-        into `_winners`, logs success, and sets `_raffle_done` so any waiting
-        FINISHED handlers can proceed.
+        An empty batch queued on the FIFO storage writer completes only after
+        every batch received so far has been persisted; its callback then
+        submits `service.compute_winners()` to the raffle process, so the
+        reactor keeps serving sockets while the bets are scanned.
+        """
+        self._storage.submit(
+            [], lambda _: self.__call_soon_threadsafe(self.__start_raffle)
+        )
+
+    def __start_raffle(self):
+        """Submit the raffle computation once all batches are persisted."""
+        self.__submit(self._raffle_pool, self.__on_raffle_done, service.compute_winners)
+
+    def __on_raffle_done(self, future: Future):
+        """Store the raffle result and send every WINNERS.
+
+        On success stores the result into `_winners` and logs it. Either way
+        every parked agency gets its (possibly empty) winners list and its
+        connection is closed once flushed. All frames are serialized into
+        `_winner_frames` before the send loop starts, so the agencies are
+        served back-to-back. Only agencies with winners get a frame of their
+        own (memoized by the tuple of documents, so equal lists share it);
+        the rest get `_EMPTY_WINNERS_FRAME`.
         """
         try:
-            self._winners = service.compute_winners()
-            logging.info("action: sorteo | result: success")
-            self._raffle_done.set()
+            self._winners = future.result()
+            _log.info("action: sorteo | result: success")
         except Exception as e:
-            logging.error("action: sorteo | result: fail | error: %s", e)
-            return
+            _log.error("action: sorteo | result: fail | error: %s", e)
+        memo: dict[tuple, Optional[list]] = {}
+        for agency_id, documents in self._winners.items():
+            key = tuple(documents)
+            if key not in memo:
+                memo[key] = self.__winners_frame(agency_id, key)
+            self._winner_frames[agency_id] = memo[key]
+        for agency_id, waiting in enumerate(self._finished, 1):
+            if waiting.closed:
+                continue
+            frame = self._winner_frames.get(agency_id, _EMPTY_WINNERS_FRAME)
+            self.__send_winners(agency_id, waiting, frame)
 
-    def __send_winners(self, agency_id, sock):
-        """Serialize and send a WINNERS response for a given agency.
+    @staticmethod
+    def __winners_frame(agency_id, documents: tuple) -> Optional[list]:
+        """Serialize the WINNERS response carrying `documents` into buffers.
 
-        Writes the framed message using protocol helpers (which use sendall),
-        and logs success or a protocol error if framing fails.
+        Returns None, after logging the protocol error, if framing fails.
         """
         try:
-            protocol.Winners(self._winners.get(agency_id, [])).write_to(sock)
-            logging.info(
-                "action: enviar_ganadores | result: success | agencia: %d", agency_id
-            )
+            return protocol.Winners(list(documents)).to_buffers()
         except protocol.ProtocolError as e:
-            logging.error(
+            _log.error(
                 "action: enviar_ganadores | result: fail | agencia: %d | error: %s",
                 agency_id,
                 e,
             )
+            return None
+
+    def __send_winners(self, agency_id, conn: Connection, frame: Optional[list]):
+        """Queue the buffers of a pre-serialized WINNERS frame and close once
+        they are flushed, all in the same `sendmsg` when possible.
+
+        A frame that could not be built (None) just closes the connection.
+        """
+        if frame is not None:
+            for buf in frame:
+                conn.sendall(buf)
+            _log.info(
+                "action: enviar_ganadores | result: success | agencia: %d", agency_id
+            )
+        conn.close_after_flush = True
+        self.__flush(conn)
+
+    def __flush(self, conn: Connection):
+        """Write as much of `outbuf` as the kernel accepts without blocking.
+
+        All queued buffers (e.g. the WINNERS header and every document) go
+        out in a single scatter-gather `sendmsg`, without concatenating them
+        first, so the kernel gets them in one syscall and can coalesce them
+        into full segments. Whatever is left waits for EVENT_WRITE. Closes the
+        connection once drained if `close_after_flush` is set, or on a socket
+        error.
+        """
+        if conn.closed:
+            return
+        if conn.outbuf:
+            try:
+                nsent = conn.sock.sendmsg(itertools.islice(conn.outbuf, MAX_IOV))
+            except (BlockingIOError, InterruptedError):
+                nsent = 0
+            except OSError as e:
+                _log.error("action: send_message | result: fail | error: %s", e)
+                self.__close(conn)
+                return
+            conn.consume(nsent)
+        if not conn.outbuf and conn.close_after_flush:
+            self.__close(conn)
+            return
+        self.__update_interest(conn)
+
+    def __update_interest(self, conn: Connection):
+        """Keep the selector registration in sync with the connection state."""
+        events = 0
+        if conn.reading:
+            events |= selectors.EVENT_READ
+        if conn.outbuf:
+            events |= selectors.EVENT_WRITE
+        if events == conn.events:
+            return
+        if conn.events == 0:
+            self._sel.register(conn.sock, events, conn)
+        elif events == 0:
+            self._sel.unregister(conn.sock)
+        else:
+            self._sel.modify(conn.sock, events, conn)
+        conn.events = events
+
+    def __close(self, conn: Connection, abort: bool = False):
+        """Unregister and close a client connection (idempotent).
+
+        With `abort`, SO_LINGER is set to zero first so the close sends an
+        RST: the kernel discards whatever the peer still has in flight
+        instead of it being read just to be thrown away.
+        """
+        if conn.closed:
+            return
+        if conn.events:
+            self._sel.unregister(conn.sock)
+            conn.events = 0
+        if abort:
+            conn.sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, _LINGER_ABORT)
+        conn.sock.close()
+        conn.inbuf.release()
+        conn.closed = True
+        self._conns.pop(conn.fd, None)
 
     def __handle_sigterm(self, *_):
         """SIGTERM handler.
 
-        Sets the global stop flag and closes the listening socket to unblock
-        `accept()`. Worker threads already running will drain naturally and
-        be joined in `run()`.
+        Intentionally empty: it only replaces the default action (terminate).
+        The signal number is written to the wakeup socket, so `select()`
+        returns right away and `__run_completed` stops the loop; every socket
+        is then closed on the way out of `run()`.
         """
-        self._stop.set()
-        self._server_socket.close()
@@ -1,4 +1,6 @@
 import socket
+import struct
+from typing import Optional
 
 
 class ProtocolError(Exception):
@@ -12,6 +14,21 @@ class ProtocolError(Exception):
         self.opcode = opcode
 
 
+# Precompiled wire formats, so no format string is parsed per field.
+_I32 = struct.Struct("<i")
+# Frame header: [opcode:u8][length:i32 LE].
+_HDR = struct.Struct("<Bi")
+
+# Size of the frame header.
+HEADER_LENGTH = _HDR.size
+# Largest body accepted, checked against the header before buffering it.
+MAX_MSG_LEN = 8 * 1024 * 1024
+# Largest receive buffer kept by a BufferPool once released.
+MAX_POOLED_BUFFER = 1024 * 1024
+# WINNERS lists at least this long are sent as scatter-gather buffers.
+SCATTER_MIN_WINNERS = 8
+
+
 class Opcodes:
     """Numeric opcodes of the wire protocol (u8)."""
 
@@ -22,9 +39,156 @@ class Opcodes:
     WINNERS = 4
 
 
+# Sink for discarded bytes, shared by every reader of the (single) reactor thread.
+_SCRATCH = bytearray(65536)
+
+
+class BufferPool:
+    """Free lists of receive buffers reused across connections, by size class.
+
+    Buffers are power-of-two sized, starting at `size` (itself a power of
+    two): `acquire(n)` rounds `n` up to its class and hands out a pooled
+    buffer of that class, or a fresh one if none is free. So a connection
+    that had to grow its buffer for a large batch leaves it for the next one
+    instead of reallocating it. `release` keeps buffers up to `max_size`
+    bytes only, so the pool never pins the memory of an oversized frame.
+    Not thread-safe: it is meant to be used from the reactor thread only.
+    """
+
+    def __init__(self, size: int, max_size: int = MAX_POOLED_BUFFER):
+        self.size = size
+        self.max_size = max_size
+        self._free: dict[int, list[bytearray]] = {}
+
+    def acquire(self, n: int) -> bytearray:
+        """Return a buffer of at least `n` bytes, pooled when possible."""
+        key = self.size if n <= self.size else 1 << (n - 1).bit_length()
+        free = self._free.get(key)
+        return free.pop() if free else bytearray(key)
+
+    def release(self, buf: bytearray) -> None:
+        """Give `buf` back to the pool; it must no longer be in use."""
+        n = len(buf)
+        if self.size <= n <= self.max_size and n & (n - 1) == 0:
+            self._free.setdefault(n, []).append(buf)
+
+
+class BufferedSock:
+    """Receive buffer of a non-blocking socket, parsed in place.
+
+    Owns a preallocated bytearray that `fill()` fills with a single
+    `recv_into` into its free tail, so one syscall brings in as many frames
+    as the kernel has buffered. The parsing helpers below take this reader
+    instead of a socket: `read(n)` returns a memoryview over the next `n`
+    buffered bytes, and `peek(n)` the same without consuming them.
+
+    Only complete frames are parsed (see `frame_length`), so running out of
+    buffered bytes means the body is shorter than its content and raises
+    ProtocolError. The buffer is compacted when full, and only grows when a
+    single frame does not fit; a frame known to be invalid from its header
+    can be `discard`ed instead. With a `pool`, buffers are taken from it and
+    handed back on growth and on `release()`.
+    """
+
+    def __init__(
+        self,
+        sock: socket.socket,
+        size: int = 65536,
+        pool: Optional[BufferPool] = None,
+    ):
+        self.sock = sock
+        self.pool = pool
+        self.buf = pool.acquire(size) if pool else bytearray(size)
+        self.view = memoryview(self.buf)
+        self.pos = 0
+        self.end = 0
+        self.skip = 0
+
+    def buffered(self) -> int:
+        """Number of received bytes not consumed yet."""
+        return self.end - self.pos
+
+    def fill(self) -> int:
+        """Receive straight into the free tail of the buffer; returns bytes read.
+
+        While bytes are left to `discard`, receives them into a shared scratch
+        buffer instead, and drops them.
+        """
+        if self.skip:
+            nrecv = self.sock.recv_into(_SCRATCH, min(self.skip, len(_SCRATCH)))
+            self.skip -= nrecv
+            return nrecv
+        if self.pos == self.end:
+            self.pos = self.end = 0
+        elif self.end == len(self.buf):
+            self.__make_room()
+        nrecv = self.sock.recv_into(self.view[self.end :])
+        self.end += nrecv
+        return nrecv
+
+    def peek(self, n: int) -> memoryview:
+        """Return up to `n` buffered bytes without consuming them."""
+        return self.view[self.pos : min(self.pos + n, self.end)]
+
+    def read(self, n: int) -> memoryview:
+        """Consume and return exactly `n` buffered bytes."""
+        if n > self.end - self.pos:
+            raise ProtocolError("indicated length doesn't match body length")
+        start = self.pos
+        self.pos += n
+        return self.view[start : self.pos]
+
+    def discard(self, n: int) -> None:
+        """Drop the next `n` bytes of the stream, buffered or not yet received.
+
+        The part not received yet is skipped by `fill`, so discarding a large
+        frame never grows the buffer.
+        """
+        dropped = min(n, self.end - self.pos)
+        self.pos += dropped
+        self.skip = n - dropped
+
+    def reserve(self, n: int) -> None:
+        """Make room for a frame of `n` bytes starting at the read position.
+
+        Called once the frame header is known, so a large frame is given its
+        final size in one step instead of one doubling (and copy) per fill.
+        """
+        if self.pos + n > len(self.buf):
+            self.__make_room(n)
+
+    def __make_room(self, n: int = 0) -> None:
+        """Move pending bytes to the front, growing the buffer if needed.
+
+        The size is doubled until `n` bytes, and at least one byte more than
+        those pending, fit.
+        """
+        pending = self.end - self.pos
+        size = len(self.buf)
+        while size < max(n, pending + 1):
+            size *= 2
+        if size == len(self.buf):
+            self.view[:pending] = self.view[self.pos : self.end]
+        else:
+            grown = self.pool.acquire(size) if self.pool else bytearray(size)
+            grown[:pending] = self.view[self.pos : self.end]
+            self.release()
+            self.buf = grown
+            self.view = memoryview(grown)
+        self.pos, self.end = 0, pending
+
+    def release(self) -> None:
+        """Return the buffer to the pool; the reader must not be used after."""
+        self.view.release()
+        if self.pool:
+            self.pool.release(self.buf)
+
+
 class RawBet:
     """Transport-level bet structure read from the wire (not the domain model)."""
 
+    __slots__ = ("agency", "first_name", "last_name", "document", "birthdate", "number")
+
     def __init__(
         self,
         agency: str,
@@ -42,6 +206,20 @@ class RawBet:
         self.number = number
 
 
+# Required NEW_BETS keys, mapped to their positional slot in `RawBet`.
+KEY_INDEX = {
+    b"AGENCIA": 0,
+    b"NOMBRE": 1,
+    b"APELLIDO": 2,
+    b"DOCUMENTO": 3,
+    b"NACIMIENTO": 4,
+    b"NUMERO": 5,
+}
+
+# Smallest encoded bet: [n_pairs] plus six pairs of one-byte strings.
+MIN_BET_LENGTH = 4 + 6 * 2 * (4 + 1)
+
+
 class NewBets:
     """Inbound NEW_BETS message.
 
@@ -58,66 +236,68 @@ class NewBets:
     def __init__(self):
         self.bets: list[RawBet] = []
         self.opcode: int = Opcodes.NEW_BETS
-        self.required = (
-            "AGENCIA",
-            "NOMBRE",
-            "APELLIDO",
-            "DOCUMENTO",
-            "NACIMIENTO",
-            "NUMERO",
-        )
         self.amount: int = 0
 
-    def __read_pair(self, sock: socket.socket, remaining: int) -> tuple[str, str, int]:
-        """Read a single <key, value> pair, both as protocol [string]."""
-        (key, remaining) = read_string(sock, remaining, self.opcode)
-        (value, remaining) = read_string(sock, remaining, self.opcode)
-        return (key, value, remaining)
-
-    def __read_bet(self, sock: socket.socket, remaining: int) -> int:
-        """Read one bet map, enforce 6 pairs and required keys, append RawBet."""
-        curr_bet: dict[str, str] = {}
-        (n_pairs, remaining) = read_i32(sock, remaining, self.opcode)
-        if n_pairs != 6:
-            raise ProtocolError("invalid body", self.opcode)
-        for _ in range(0, n_pairs):
-            (k, v, remaining) = self.__read_pair(sock, remaining)
-            curr_bet[k] = v
-        if [k for k in self.required if k not in curr_bet]:
-            raise ProtocolError("invalid body", self.opcode)
-        self.bets.append(
-            RawBet(
-                curr_bet["AGENCIA"],
-                curr_bet["NOMBRE"],
-                curr_bet["APELLIDO"],
-                curr_bet["DOCUMENTO"],
-                curr_bet["NACIMIENTO"],
-                curr_bet["NUMERO"],
-            )
-        )
-        return remaining
-
-    def read_from(self, sock, length: int):
-        """Parse the complete NEW_BETS body and enforce exact-length consumption.
-
-        Reads the `n_bets` counter and then consumes each bet map. If, after
-        parsing, `remaining != 0`, raises ProtocolError. On parse failure, drains
-        the remaining bytes (to keep the stream synchronized) and re-raises.
-        """
-        remaining = length
-        try:
-            n_bets, remaining = read_i32(sock, remaining, self.opcode)
-            self.amount = n_bets
-            for _ in range(n_bets):
-                remaining = self.__read_bet(sock, remaining)
-            if remaining != 0:
-                raise ProtocolError(
-                    "indicated length doesn't match body length", self.opcode
-                )
-        except ProtocolError:
-            if remaining > 0:
-                _ = recv_exactly(sock, remaining)
-            raise
+    def parse(self, body: memoryview):
+        """Parse the complete NEW_BETS body with `parse_new_bets`."""
+        self.amount, self.bets = parse_new_bets(bytes(body))
+
+
+def parse_new_bets(body: bytes) -> tuple[int, list[RawBet]]:
+    """Decode a NEW_BETS body into its `n_bets` counter and the `RawBet`s.
+
+    Walks `body` with a flat loop over offsets, working on a single `bytes`
+    copy so keys and values are plain slices: every key is looked up in
+    `KEY_INDEX`, and its value stored in that slot of the bet. The bets list
+    is preallocated once `n_bets` is checked against the most bets `body`
+    could hold (`MIN_BET_LENGTH` each). Raises ProtocolError if a bet does
+    not have exactly the six required keys or a string is empty or not UTF-8,
+    and if the content does not end exactly at the end of `body`.
+    """
+    opcode = Opcodes.NEW_BETS
+    length = len(body)
+    unpack_from = _I32.unpack_from
+    key_index = KEY_INDEX.get
+    try:
+        (n_bets,) = unpack_from(body, 0)
+        if n_bets > (length - 4) // MIN_BET_LENGTH:
+            raise struct.error("more bets than the body can hold")
+        bets: list[RawBet] = [None] * n_bets
+        off = 4
+        for i in range(n_bets):
+            (n_pairs,) = unpack_from(body, off)
+            off += 4
+            if n_pairs != 6:
+                raise ProtocolError("invalid body", opcode)
+            fields = [None] * 6
+            for _ in range(6):
+                (key_len,) = unpack_from(body, off)
+                off += 4
+                end = off + key_len
+                if key_len <= 0:
+                    raise ProtocolError("invalid body", opcode)
+                if end > length:
+                    raise struct.error("key past the end of the body")
+                slot = key_index(body[off:end])
+                (value_len,) = unpack_from(body, end)
+                off = end + 4
+                end = off + value_len
+                if slot is None or value_len <= 0:
+                    raise ProtocolError("invalid body", opcode)
+                if end > length:
+                    raise struct.error("value past the end of the body")
+                fields[slot] = body[off:end].decode()
+                off = end
+            if None in fields:
+                raise ProtocolError("invalid body", opcode)
+            bets[i] = RawBet(*fields)
+    except struct.error as e:
+        raise ProtocolError("indicated length doesn't match body length", opcode) from e
+    except UnicodeDecodeError as e:
+        raise ProtocolError("invalid body", opcode) from e
+    if off != length:
+        raise ProtocolError("indicated length doesn't match body length", opcode)
+    return n_bets, bets
 
 
 class Finished:
@@ -128,141 +308,94 @@ class Finished:
         self.agency_id = None
         self._length = 4
 
-    def read_from(self, sock: socket.socket, length: int):
+    def parse(self, body: memoryview):
         """Validate fixed body length (4) and read agency_id."""
-        if length != self._length:
+        if len(body) != self._length:
             raise ProtocolError("invalid length", self.opcode)
-        (agency_id, _) = read_i32(sock, length, self.opcode)
-        self.agency_id = agency_id
+        (self.agency_id,) = _I32.unpack_from(body)
 
 
-def recv_exactly(sock: socket.socket, n: int) -> bytes:
-    """Read exactly n bytes (retrying as needed) or raise EOFError on peer close.
+# Inbound message classes, indexed by opcode (None: not a client message).
+_PARSERS = (NewBets, None, None, Finished)
 
-    Converts timeouts/OS errors to ProtocolError. Prevents short reads.
-    """
-    if n < 0:
-        raise ProtocolError("invalid body")
-    data = bytearray(n)
-    view = memoryview(data)
-    read = 0
-    while read < n:
-        try:
-            nrecv = sock.recv_into(view[read:], n - read)
-        except socket.timeout as e:
-            raise ProtocolError("recv timeout") from e
-        except InterruptedError:
-            continue
-        except OSError as e:
-            raise ProtocolError(f"recv failed: {e}") from e
-        if nrecv == 0:
-            raise EOFError("peer closed connection")
-        read += nrecv
-    return bytes(data)
-
-
-def read_u8(sock: socket.socket) -> int:
-    """Read one unsigned byte (u8)."""
-    return recv_exactly(sock, 1)[0]
-
-
-def read_i32(sock: socket.socket, remaining: int, opcode: int) -> tuple[int, int]:
-    """Read a little-endian signed int32 and decrement `remaining` accordingly.
-
-    Raises ProtocolError if fewer than 4 bytes remain to be read.
-    """
-    if remaining < 4:
-        raise ProtocolError("indicated length doesn't match body length", opcode)
-    remaining -= 4
-    val = int.from_bytes(recv_exactly(sock, 4), byteorder="little", signed=True)
-    return val, remaining
+
+def is_inbound_opcode(opcode: int) -> bool:
+    """Tell whether `opcode` identifies a message a client may send."""
+    return opcode < len(_PARSERS) and _PARSERS[opcode] is not None
 
 
-def read_string(sock: socket.socket, remaining: int, opcode: int) -> (str, int):
-    """Read a protocol [string]: i32 length (validated) + UTF-8 bytes.
+def frame_length(buf) -> int:
+    """Return the size (header included) of the frame at the start of `buf`.
 
-    Ensures a strictly positive length and sufficient remaining payload.
-    Returns the decoded string and the updated `remaining`.
+    Returns 0 while the [opcode][length] header is not complete yet. Raises
+    ProtocolError on a negative length or one above MAX_MSG_LEN, after which
+    the stream cannot be resynchronized (or is not worth buffering).
     """
-    (key_len, remaining) = read_i32(sock, remaining, opcode)
-    if key_len <= 0:
-        raise ProtocolError("invalid body", opcode)
-    if remaining < key_len:
-        raise ProtocolError("indicated length doesn't match body length", opcode)
-    try:
-        s = recv_exactly(sock, key_len).decode("utf-8")
-    except UnicodeDecodeError as e:
-        raise ProtocolError("invalid body", opcode) from e
-    remaining -= key_len
-    return (s, remaining)
+    if len(buf) < HEADER_LENGTH:
+        return 0
+    _, length = _HDR.unpack_from(buf)
+    if not 0 <= length <= MAX_MSG_LEN:
+        raise ProtocolError("invalid length")
+    return HEADER_LENGTH + length
 
 
-def recv_msg(sock: socket.socket):
+def recv_exactly(reader: BufferedSock, n: int) -> memoryview:
+    """Consume exactly n buffered bytes, or raise ProtocolError if short."""
+    if n < 0:
+        raise ProtocolError("invalid body")
+    return reader.read(n)
+
+
+def recv_msg(sock: BufferedSock):
     """Read a single framed message and dispatch by opcode.
 
-    Reads opcode (u8) and length (i32 LE), validates length, then dispatches
-    to the appropriate message class. Raises ProtocolError on invalid opcode.
+    Reads the [opcode:u8][length:i32 LE] header in one unpack, validates
+    length (0 to MAX_MSG_LEN), then takes the whole body from the reader at
+    once (so the stream stays synchronized even if parsing fails) and hands
+    it to the `parse` method of the message class found in `_PARSERS` by
+    opcode. Raises ProtocolError on invalid opcode.
     """
-    opcode = read_u8(sock)
-    (length, _) = read_i32(sock, 4, -1)
-    if length < 0:
+    opcode, length = _HDR.unpack_from(sock.read(HEADER_LENGTH))
+    if not 0 <= length <= MAX_MSG_LEN:
         raise ProtocolError("invalid length")
-    if opcode == Opcodes.NEW_BETS:
-        msg = NewBets()
-        msg.read_from(sock, length)
-        return msg
-    if opcode == Opcodes.FINISHED:
-        msg = Finished()
-        msg.read_from(sock, length)
-        return msg
-    raise ProtocolError(f"invalid opcode: {opcode}")
-
+    if not is_inbound_opcode(opcode):
+        raise ProtocolError(f"invalid opcode: {opcode}")
+    msg = _PARSERS[opcode]()
+    msg.parse(recv_exactly(sock, length))
+    return msg
 
-def write_u8(sock, value: int) -> None:
-    """Write a single unsigned byte (u8) using sendall()."""
-    if not 0 <= value <= 255:
-        raise ValueError("u8 out of range")
-    sock.sendall(bytes([value]))
 
+class OutboundMessage:
+    """Base class of server→client messages, which implement `to_bytes`.
 
-def write_i32(sock: socket.socket, value: int) -> None:
-    """Write a little-endian signed int32 using sendall()."""
-    sock.sendall(int(value).to_bytes(4, byteorder="little", signed=True))
-
-
-def write_string(sock: socket.socket, s: str) -> None:
-    """Write a protocol [string]: i32 length prefix + UTF-8 bytes."""
-    b = s.encode("utf-8")
-    n = len(b)
-    write_i32(sock, n)
-    sock.sendall(b)
+    Replies are framed once into bytes (or buffers) and queued on the
+    connection by the reactor, which sends them when the socket is writable.
+    """
 
 
-class BetsRecvSuccess:
+class BetsRecvSuccess(OutboundMessage):
     """Outbound BETS_RECV_SUCCESS response (empty body)."""
 
     def __init__(self):
         self.opcode = Opcodes.BETS_RECV_SUCCESS
 
-    def write_to(self, sock: socket.socket):
-        """Frame and send the success response: [opcode][length=0]."""
-        write_u8(sock, self.opcode)
-        write_i32(sock, 0)
+    def to_bytes(self) -> bytes:
+        """Frame the success response: [opcode][length=0]."""
+        return _HDR.pack(self.opcode, 0)
 
 
-class BetsRecvFail:
+class BetsRecvFail(OutboundMessage):
     """Outbound BETS_RECV_FAIL response (empty body)."""
 
     def __init__(self):
         self.opcode = Opcodes.BETS_RECV_FAIL
 
-    def write_to(self, sock: socket.socket):
-        """Frame and send the failure response: [opcode][length=0]."""
-        write_u8(sock, self.opcode)
-        write_i32(sock, 0)
+    def to_bytes(self) -> bytes:
+        """Frame the failure response: [opcode][length=0]."""
+        return _HDR.pack(self.opcode, 0)
 
 
-class Winners:
+class Winners(OutboundMessage):
     """Outbound WINNERS response.
 
     Body layout:
@@ -274,13 +407,44 @@ class Winners:
         self.opcode = Opcodes.WINNERS
         self.list = winners
 
-    def write_to(self, sock: socket.socket):
-        """Frame and send the winners list using sendall() for each chunk."""
+    def to_bytes(self) -> bytearray:
+        """Frame the winners list into one preallocated buffer.
+
+        Documents are encoded once, the body length is computed from the
+        encoded sizes, and every field is packed in place.
+        """
+        encoded = [document.encode("utf-8") for document in self.list]
+        body_length = 4
+        for b in encoded:
+            body_length += 4 + len(b)
+        buf = bytearray(HEADER_LENGTH + body_length)
+        _HDR.pack_into(buf, 0, self.opcode, body_length)
+        _I32.pack_into(buf, HEADER_LENGTH, len(encoded))
+        off = HEADER_LENGTH + 4
+        for b in encoded:
+            _I32.pack_into(buf, off, len(b))
+            off += 4
+            buf[off : off + len(b)] = b
+            off += len(b)
+        return buf
+
+    def to_buffers(self) -> list:
+        """Frame the winners list as the buffers of one scatter-gather send.
+
+        From SCATTER_MIN_WINNERS documents on, returns the header (with the
+        count) followed by each document's length prefix and its encoded
+        bytes, so `sendmsg` can send them in one call without concatenating
+        the documents first. Shorter lists are cheaper to copy, and come back
+        as a single `to_bytes()` buffer.
+        """
+        if len(self.list) < SCATTER_MIN_WINNERS:
+            return [self.to_bytes()]
+        encoded = [document.encode("utf-8") for document in self.list]
         body_length = 4
-        for document in self.list:
-            body_length += 4 + len(document)
-        write_u8(sock, self.opcode)
-        write_i32(sock, body_length)
-        write_i32(sock, len(self.list))
-        for document in self.list:
-            write_string(sock, document)
+        for b in encoded:
+            body_length += 4 + len(b)
+        buffers = [_HDR.pack(self.opcode, body_length) + _I32.pack(len(encoded))]
+        for b in encoded:
+            buffers.append(_I32.pack(len(b)))
+            buffers.append(b)
+        return buffers
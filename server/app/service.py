@@ -1,33 +1,123 @@
+import collections
+import csv
+import os
+import queue
+import threading
+from typing import Callable, Iterable
+
 from common import utils
 
 from .protocol import RawBet
 
 
-def _to_utils_bet(rb: RawBet) -> utils.Bet:
-    return utils.Bet(
-        rb.agency, rb.first_name, rb.last_name, rb.document, rb.birthdate, rb.number
-    )
+def open_storage() -> int:
+    """Open the bets storage once; the returned fd is kept by BetsWriter."""
+    return utils.open_bets_storage()
 
 
-def store_bets(raw_bets: list[RawBet]) -> int:
+def encode_bets(raw_bets: Iterable[RawBet]) -> bytes:
     """
-    Converts transport-level RawBet objects to utils.Bet (domain model) and
-    persists them via utils.store_bets.
-    Returns the number of stored bets.
+    Converts transport-level RawBet objects to utils.Bet (domain model), which
+    validates them, and serializes them as the csv rows to append. The
+    conversion is streamed into the csv serialization, without building an
+    intermediate list; an invalid bet raises.
+    """
+    return utils.encode_bets(
+        utils.Bet(
+            rb.agency,
+            rb.first_name,
+            rb.last_name,
+            rb.document,
+            rb.birthdate,
+            rb.number,
+        )
+        for rb in raw_bets
+    )
+
+
+class BetsWriter:
+    """Dedicated thread persisting NEW_BETS batches, fed by a queue.
+
+    `submit` only enqueues, so the caller never waits for the disk. The
+    writer takes every batch queued so far, validates and serializes each
+    one on its own (an invalid batch fails alone) and appends all the valid
+    ones with a single write. Then `on_done(error)` is called, on the writer
+    thread, for each batch in submission order, with None on success. An
+    empty batch is a barrier: it completes after every batch submitted
+    before it. The thread only runs between `start` and `close`.
     """
-    bets = [_to_utils_bet(rb) for rb in raw_bets]
-    utils.store_bets(bets)
-    return len(bets)
+
+    def __init__(self):
+        self._fd = open_storage()
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self.__run, name="storage")
+
+    def start(self) -> None:
+        """Start the writer thread; batches submitted before are kept queued."""
+        self._thread.start()
+
+    def submit(self, raw_bets: list[RawBet], on_done: Callable) -> None:
+        """Queue a batch to be persisted; `on_done(error)` runs once it is."""
+        self._queue.put((raw_bets, on_done))
+
+    def close(self) -> None:
+        """Persist the batches already queued, stop the thread, close the fd."""
+        self._queue.put(None)
+        self._thread.join()
+        os.close(self._fd)
+
+    def __run(self):
+        """Drain the queue and persist what it held until the None sentinel."""
+        running = True
+        while running:
+            pending = [self._queue.get()]
+            while True:
+                try:
+                    pending.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in pending:
+                running = False
+                pending = pending[: pending.index(None)]
+            self.__write(pending)
+
+    def __write(self, pending: list):
+        """Append the valid batches of `pending` at once and report each one."""
+        chunks = []
+        errors = []
+        for raw_bets, _ in pending:
+            try:
+                chunks.append(encode_bets(raw_bets))
+                errors.append(None)
+            except Exception as e:
+                errors.append(e)
+        try:
+            utils.write_all(self._fd, b"".join(chunks))
+        except OSError as e:
+            errors = [error or e for error in errors]
+        for (_, on_done), error in zip(pending, errors):
+            on_done(error)
 
 
 def compute_winners() -> dict[int, list[str]]:
     """Compute and group winners by agency.
 
-    Loads all persisted bets, filters those that won (utils.has_won),
-    and returns a dict mapping agency_id -> list of winner documents.
+    Scans the persisted bets, keeps those that won (utils.has_won), and
+    returns a dict mapping agency_id -> list of winner documents. The number
+    is stored as an int, so rows whose number column is not exactly the
+    winning one are skipped before being turned into utils.Bet (whose date
+    parsing dominates `utils.load_bets`). Rows are read with csv.reader over
+    the whole file, so quoted fields spanning several lines stay in one row.
+    Winners are grouped in the same pass, into a defaultdict so no empty
+    list is built per winner.
     """
-    res: dict[int, list[str]] = {}
-    for b in utils.load_bets():
-        if utils.has_won(b):
-            res.setdefault(b.agency, []).append(b.document)
-    return res
+    winner = str(utils.LOTTERY_WINNER_NUMBER)
+    res: dict[int, list[str]] = collections.defaultdict(list)
+    with open(utils.STORAGE_FILEPATH, "r", newline="") as file:
+        for row in csv.reader(file, quoting=csv.QUOTE_MINIMAL):
+            if row[5] != winner:
+                continue
+            b = utils.Bet(row[0], row[1], row[2], row[3], row[4], row[5])
+            if utils.has_won(b):
+                res[b.agency].append(b.document)
+    return dict(res)
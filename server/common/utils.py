@@ -1,6 +1,9 @@
 import csv
 import datetime
+import io
+import os
 import time
+from typing import Iterable
 
 """ Bets storage location. """
 STORAGE_FILEPATH = "./bets.csv"
@@ -12,6 +15,8 @@ LOTTERY_WINNER_NUMBER = 7574
 
 
 class Bet:
+    __slots__ = ("agency", "first_name", "last_name", "document", "birthdate", "number")
+
     def __init__(
         self,
         agency: str,
@@ -48,19 +53,67 @@ Not thread-safe/process-safe.
 
 
 def store_bets(bets: list[Bet]) -> None:
-    with open(STORAGE_FILEPATH, "a+") as file:
-        writer = csv.writer(file, quoting=csv.QUOTE_MINIMAL)
-        for bet in bets:
-            writer.writerow(
-                [
-                    bet.agency,
-                    bet.first_name,
-                    bet.last_name,
-                    bet.document,
-                    bet.birthdate,
-                    bet.number,
-                ]
-            )
+    fd = open_bets_storage()
+    try:
+        append_bets(fd, bets)
+    finally:
+        os.close(fd)
+
+
+"""
+Opens the STORAGE_FILEPATH file for appending and returns its raw file
+descriptor, meant to be kept open and reused by append_bets.
+"""
+
+
+def open_bets_storage() -> int:
+    return os.open(STORAGE_FILEPATH, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+
+"""
+Serializes the bets as csv rows, in memory, into the bytes that
+append_bets writes.
+"""
+
+
+def encode_bets(bets: Iterable[Bet]) -> bytes:
+    rows = io.StringIO()
+    writer = csv.writer(rows, quoting=csv.QUOTE_MINIMAL)
+    writer.writerows(
+        (
+            bet.agency,
+            bet.first_name,
+            bet.last_name,
+            bet.document,
+            bet.birthdate,
+            bet.number,
+        )
+        for bet in bets
+    )
+    return rows.getvalue().encode()
+
+
+"""
+Writes all of `data` to the file descriptor `fd`, retrying only on short
+writes.
+"""
+
+
+def write_all(fd: int, data: bytes) -> None:
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view) :]
+
+
+"""
+Serializes the bets as csv rows in memory and appends them to the file
+descriptor `fd` with a single write (retried only on short writes).
+Not thread-safe/process-safe.
+"""
+
+
+def append_bets(fd: int, bets: Iterable[Bet]) -> None:
+    write_all(fd, encode_bets(bets))
 
 
 """
@@ -1,9 +1,12 @@
 #!/usr/bin/env python3
 
 import logging
+import logging.handlers
 import os
+import queue
 from configparser import ConfigParser
 
+from app.logs import BufferedStreamHandler, DeferredQueueHandler
 from app.net import Server
 
 
@@ -53,7 +56,7 @@ def main():
     listen_backlog = config_params["listen_backlog"]
     clients_amount = config_params["clients_amount"]
 
-    initialize_log(logging_level)
+    log_listener = initialize_log(logging_level)
 
     # Log config parameters at the beginning of the program to verify the configuration
     # of the component
@@ -63,8 +66,12 @@ def main():
     )
 
     # Initialize server and start server loop
-    server = Server(port, listen_backlog, clients_amount)
-    server.run()
+    try:
+        server = Server(port, listen_backlog, clients_amount)
+        server.run()
+    finally:
+        log_listener.stop()
+        logging.shutdown()
 
 
 def initialize_log(logging_level):
@@ -73,12 +80,31 @@ def initialize_log(logging_level):
 
     Current timestamp is added to be able to identify in docker
     compose logs the date when the log has arrived
+
+    Records are only enqueued by the logging calls: DeferredQueueHandler
+    skips the stock QueueHandler formatting, so both formatting and the
+    actual write happen on the returned QueueListener background thread,
+    which must be stopped before exiting to drain pending records. The
+    listener writes to stderr through a BufferedStreamHandler, so lines are
+    batched into large writes instead of one syscall each.
     """
     logging.basicConfig(
         format="%(asctime)s %(levelname)-8s %(message)s",
         level=logging_level,
         datefmt="%Y-%m-%d %H:%M:%S",
+        handlers=[BufferedStreamHandler()],
+    )
+    root = logging.getLogger()
+    handlers = root.handlers[:]
+    log_queue = queue.Queue(-1)
+    for handler in handlers:
+        root.removeHandler(handler)
+    root.addHandler(DeferredQueueHandler(log_queue))
+    listener = logging.handlers.QueueListener(
+        log_queue, *handlers, respect_handler_level=True
     )
+    listener.start()
+    return listener
 
 
 if __name__ == "__main__":
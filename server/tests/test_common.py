@@ -46,6 +46,21 @@ class TestUtils(unittest.TestCase):
         self._assert_equal_bets(to_store[0], from_load[0])
         self._assert_equal_bets(to_store[1], from_load[1])
 
+    def test_append_bets_to_open_storage_and_load_bets_keeps_registry_order(self):
+        to_store = [
+            Bet('0', 'first_0', 'last_0', '10000000','2000-12-20', 7500),
+            Bet('1', 'first_1', 'last_1', '10000001','2000-12-21', 7501),
+        ]
+        fd = open_bets_storage()
+        append_bets(fd, to_store[:1])
+        append_bets(fd, to_store[1:])
+        os.close(fd)
+        from_load = list(load_bets())
+
+        self.assertEqual(2, len(from_load))
+        self._assert_equal_bets(to_store[0], from_load[0])
+        self._assert_equal_bets(to_store[1], from_load[1])
+
     def _assert_equal_bets(self, b1, b2):
         self.assertEqual(b1.agency, b2.agency)
         self.assertEqual(b1.first_name, b2.first_name)
@@ -0,0 +1,179 @@
+import logging
+import os
+import socket
+import struct
+import threading
+import time
+import unittest
+
+from app import net, protocol
+from common.utils import LOTTERY_WINNER_NUMBER, STORAGE_FILEPATH
+
+
+def _string(s):
+    b = s.encode('utf-8')
+    return struct.pack('<i', len(b)) + b
+
+
+def _frame(opcode, body):
+    return bytes([opcode]) + struct.pack('<i', len(body)) + body
+
+
+def _new_bets_frame(agency, document, number):
+    pairs = [
+        ('AGENCIA', str(agency)),
+        ('NOMBRE', 'first'),
+        ('APELLIDO', 'last'),
+        ('DOCUMENTO', document),
+        ('NACIMIENTO', '2000-12-20'),
+        ('NUMERO', str(number)),
+    ]
+    bet = struct.pack('<i', len(pairs)) + b''.join(_string(k) + _string(v) for k, v in pairs)
+    return _frame(protocol.Opcodes.NEW_BETS, struct.pack('<i', 1) + bet)
+
+
+def _finished_frame(agency):
+    return _frame(protocol.Opcodes.FINISHED, struct.pack('<i', agency))
+
+
+def _recv_exactly(sock, n):
+    data = b''
+    while len(data) < n:
+        chunk = sock.recv(n - len(data))
+        if not chunk:
+            raise EOFError
+        data += chunk
+    return data
+
+
+def _recv_frame(sock):
+    opcode, length = struct.unpack('<Bi', _recv_exactly(sock, protocol.HEADER_LENGTH))
+    return opcode, _recv_exactly(sock, length)
+
+
+def _wait_until(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError('condition not met in time')
+        time.sleep(0.01)
+
+
+def _winners(body):
+    (count,) = struct.unpack_from('<i', body)
+    off = 4
+    documents = []
+    for _ in range(count):
+        (length,) = struct.unpack_from('<i', body, off)
+        off += 4
+        documents.append(body[off:off + length].decode('utf-8'))
+        off += length
+    return documents
+
+
+class _Gate(logging.Handler):
+    """Blocks the logging thread on the first record containing `text`."""
+
+    def __init__(self, text):
+        super().__init__()
+        self.text = text
+        self.entered = threading.Event()
+        self.opened = threading.Event()
+
+    def emit(self, record):
+        if not self.entered.is_set() and self.text in record.getMessage():
+            self.entered.set()
+            self.opened.wait(5)
+
+
+class TestServer(unittest.TestCase):
+
+    def _start(self, clients_amount):
+        self.addCleanup(lambda: os.path.exists(STORAGE_FILEPATH) and os.remove(STORAGE_FILEPATH))
+        self.server = net.Server(0, 5, clients_amount)
+        self.port = self.server._server_socket.getsockname()[1]
+        self.thread = threading.Thread(target=self.server.run)
+        self.thread.start()
+        self.addCleanup(self.thread.join, 10)
+        self.addCleanup(self.server.stop)
+
+    def _connect(self):
+        sock = socket.create_connection(('127.0.0.1', self.port), timeout=5)
+        self.addCleanup(sock.close)
+        return sock
+
+    def test_agencies_must_get_bets_acks_and_their_winners(self):
+        self._start(2)
+        agencies = [self._connect(), self._connect()]
+        agencies[0].sendall(_new_bets_frame(1, '10000000', LOTTERY_WINNER_NUMBER))
+        agencies[1].sendall(_new_bets_frame(2, '10000001', LOTTERY_WINNER_NUMBER + 1))
+        for sock in agencies:
+            self.assertEqual(protocol.Opcodes.BETS_RECV_SUCCESS, _recv_frame(sock)[0])
+        for agency, sock in enumerate(agencies, 1):
+            sock.sendall(_finished_frame(agency))
+
+        opcode, body = _recv_frame(agencies[0])
+        self.assertEqual(protocol.Opcodes.WINNERS, opcode)
+        self.assertEqual(['10000000'], _winners(body))
+        opcode, body = _recv_frame(agencies[1])
+        self.assertEqual(protocol.Opcodes.WINNERS, opcode)
+        self.assertEqual([], _winners(body))
+
+    def test_unexpected_finished_must_close_only_its_connection(self):
+        self._start(2)
+        first, duplicate, out_of_range, second = [self._connect() for _ in range(4)]
+        first.sendall(_finished_frame(1))
+        _wait_until(lambda: self.server._finished[0] is not None)
+        with self.assertLogs('app.net', 'ERROR') as logs:
+            duplicate.sendall(_finished_frame(1))
+            self.assertEqual(b'', duplicate.recv(1))
+            out_of_range.sendall(_finished_frame(3))
+            self.assertEqual(b'', out_of_range.recv(1))
+
+        self.assertEqual(2, len(logs.records))
+        second.sendall(_finished_frame(2))
+        self.assertEqual(protocol.Opcodes.WINNERS, _recv_frame(first)[0])
+        self.assertEqual(protocol.Opcodes.WINNERS, _recv_frame(second)[0])
+
+    def test_invalid_header_must_reset_connection(self):
+        self._start(1)
+        sock = self._connect()
+        with self.assertLogs('app.net', 'ERROR'):
+            sock.sendall(bytes([protocol.Opcodes.NEW_BETS]) + struct.pack('<i', -1))
+            with self.assertRaises(ConnectionResetError):
+                sock.recv(1)
+        self.assertTrue(self.thread.is_alive())
+
+    def test_peer_reset_with_pending_reply_must_not_stop_server(self):
+        self._start(2)
+        held = []
+        submit = self.server._storage.submit
+        self.server._storage.submit = lambda raw_bets, on_done: held.append(on_done)
+        logger = logging.getLogger('app.net')
+        gate = _Gate('opcode: %d' % protocol.Opcodes.FINISHED)
+        logger.addHandler(gate)
+        self.addCleanup(logger.removeHandler, gate)
+        self.addCleanup(logger.setLevel, logger.level)
+        logger.setLevel(logging.INFO)
+
+        victim = self._connect()
+        victim.sendall(_new_bets_frame(1, '10000000', 1))
+        _wait_until(lambda: held)
+        # Park the reactor while the stored batch is reported and the victim
+        # resets, so both events come back from the same select().
+        self._connect().sendall(_finished_frame(2))
+        self.assertTrue(gate.entered.wait(5))
+        held[0](None)
+        victim.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+        victim.close()
+        self.server._storage.submit = submit
+        gate.opened.set()
+
+        sock = self._connect()
+        sock.sendall(_new_bets_frame(1, '10000001', 1))
+        self.assertEqual(protocol.Opcodes.BETS_RECV_SUCCESS, _recv_frame(sock)[0])
+        self.assertTrue(self.thread.is_alive())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,175 @@
+import socket
+import struct
+import unittest
+
+from app import protocol
+
+
+def _string(s):
+    b = s.encode('utf-8')
+    return struct.pack('<i', len(b)) + b
+
+
+def _frame(opcode, body):
+    return bytes([opcode]) + struct.pack('<i', len(body)) + body
+
+
+def _bet_map(agency='1', document='10000000', number='7500'):
+    pairs = [
+        ('AGENCIA', agency),
+        ('NOMBRE', 'first'),
+        ('APELLIDO', 'last'),
+        ('DOCUMENTO', document),
+        ('NACIMIENTO', '2000-12-20'),
+        ('NUMERO', number),
+    ]
+    return struct.pack('<i', len(pairs)) + b''.join(_string(k) + _string(v) for k, v in pairs)
+
+
+def _new_bets_frame(*bets):
+    return _frame(protocol.Opcodes.NEW_BETS, struct.pack('<i', len(bets)) + b''.join(bets))
+
+
+class TestProtocol(unittest.TestCase):
+
+    def _reader(self, data, size=65536):
+        client, server = socket.socketpair()
+        self.addCleanup(server.close)
+        client.sendall(data)
+        client.close()
+        reader = protocol.BufferedSock(server, size)
+        while reader.fill():
+            pass
+        return reader
+
+    def test_frame_length_with_incomplete_header_must_be_zero(self):
+        self.assertEqual(0, protocol.frame_length(b'\x00\x01\x00'))
+
+    def test_frame_length_must_include_header(self):
+        frame = _frame(protocol.Opcodes.FINISHED, struct.pack('<i', 1))
+        self.assertEqual(len(frame), protocol.frame_length(frame[:protocol.HEADER_LENGTH]))
+
+    def test_frame_length_with_negative_length_must_fail(self):
+        with self.assertRaises(protocol.ProtocolError):
+            protocol.frame_length(bytes([0]) + struct.pack('<i', -1))
+
+    def test_frame_length_above_max_msg_len_must_fail(self):
+        with self.assertRaises(protocol.ProtocolError):
+            protocol.frame_length(bytes([0]) + struct.pack('<i', protocol.MAX_MSG_LEN + 1))
+
+    def test_recv_msg_new_bets_must_keep_fields(self):
+        frame = _new_bets_frame(_bet_map('1', '10000000'), _bet_map('2', '10000001', '7574'))
+        msg = protocol.recv_msg(self._reader(frame))
+
+        self.assertEqual(protocol.Opcodes.NEW_BETS, msg.opcode)
+        self.assertEqual(2, msg.amount)
+        self.assertEqual(['1', '2'], [b.agency for b in msg.bets])
+        self.assertEqual(['10000000', '10000001'], [b.document for b in msg.bets])
+        self.assertEqual('first', msg.bets[0].first_name)
+        self.assertEqual('last', msg.bets[0].last_name)
+        self.assertEqual('2000-12-20', msg.bets[0].birthdate)
+        self.assertEqual('7574', msg.bets[1].number)
+
+    def test_recv_msg_new_bets_with_missing_key_must_fail(self):
+        bet = struct.pack('<i', 6) + b''.join(_string(k) + _string('x') for k in ['AGENCIA'] * 6)
+        with self.assertRaises(protocol.ProtocolError):
+            protocol.recv_msg(self._reader(_new_bets_frame(bet)))
+
+    def test_recv_msg_new_bets_with_short_length_must_fail(self):
+        frame = bytearray(_new_bets_frame(_bet_map()))
+        frame[1:5] = struct.pack('<i', 8)
+        with self.assertRaises(protocol.ProtocolError):
+            protocol.recv_msg(self._reader(bytes(frame[:protocol.HEADER_LENGTH + 8])))
+
+    def test_recv_msg_new_bets_with_more_bets_than_body_must_fail(self):
+        frame = _frame(protocol.Opcodes.NEW_BETS, struct.pack('<i', 2 ** 31 - 1) + _bet_map())
+        with self.assertRaises(protocol.ProtocolError):
+            protocol.recv_msg(self._reader(frame))
+
+    def test_recv_msg_finished_must_keep_agency_id(self):
+        frame = _frame(protocol.Opcodes.FINISHED, struct.pack('<i', 3))
+        msg = protocol.recv_msg(self._reader(frame))
+
+        self.assertEqual(protocol.Opcodes.FINISHED, msg.opcode)
+        self.assertEqual(3, msg.agency_id)
+
+    def test_recv_msg_with_invalid_opcode_must_fail(self):
+        with self.assertRaises(protocol.ProtocolError):
+            protocol.recv_msg(self._reader(_frame(9, b'')))
+
+    def test_buffered_sock_must_grow_when_frame_does_not_fit(self):
+        frame = _new_bets_frame(*[_bet_map(document=str(10000000 + i)) for i in range(8)])
+        reader = self._reader(frame, size=64)
+
+        self.assertEqual(len(frame), reader.buffered())
+        self.assertEqual(8, protocol.recv_msg(reader).amount)
+        self.assertEqual(0, reader.buffered())
+
+    def test_buffered_sock_reserve_must_fit_whole_frame(self):
+        frame = _new_bets_frame(*[_bet_map(document=str(10000000 + i)) for i in range(8)])
+        reader = self._reader(frame[:protocol.HEADER_LENGTH], size=64)
+        reader.reserve(len(frame))
+
+        self.assertGreaterEqual(len(reader.buf), len(frame))
+        self.assertEqual(frame[:protocol.HEADER_LENGTH], bytes(reader.peek(protocol.HEADER_LENGTH)))
+
+    def test_buffer_pool_must_reuse_released_buffers(self):
+        pool = protocol.BufferPool(64)
+        reader = protocol.BufferedSock(None, 64, pool)
+        buf = reader.buf
+        reader.release()
+
+        self.assertIs(buf, pool.acquire(64))
+        self.assertEqual(128, len(pool.acquire(128)))
+
+    def test_buffer_pool_must_reuse_grown_buffers_by_size_class(self):
+        pool = protocol.BufferPool(64, max_size=256)
+        grown = pool.acquire(100)
+        oversized = pool.acquire(512)
+        pool.release(grown)
+        pool.release(oversized)
+
+        self.assertEqual(128, len(grown))
+        self.assertIs(grown, pool.acquire(128))
+        self.assertIsNot(oversized, pool.acquire(512))
+
+    def test_buffered_sock_discard_must_skip_unbuffered_bytes(self):
+        client, server = socket.socketpair()
+        self.addCleanup(server.close)
+        client.sendall(_frame(9, bytes(20000)) + _frame(protocol.Opcodes.FINISHED, struct.pack('<i', 3)))
+        client.close()
+        reader = protocol.BufferedSock(server, 64)
+        reader.fill()
+        reader.discard(protocol.frame_length(reader.peek(protocol.HEADER_LENGTH)))
+        while reader.fill():
+            pass
+
+        self.assertEqual(64, len(reader.buf))
+        self.assertEqual(3, protocol.recv_msg(reader).agency_id)
+
+    def test_recv_msg_must_leave_next_frame_buffered(self):
+        finished = _frame(protocol.Opcodes.FINISHED, struct.pack('<i', 3))
+        reader = self._reader(_new_bets_frame(_bet_map()) + finished)
+
+        self.assertEqual(protocol.Opcodes.NEW_BETS, protocol.recv_msg(reader).opcode)
+        self.assertEqual(3, protocol.recv_msg(reader).agency_id)
+
+    def test_bets_recv_success_to_bytes_must_have_empty_body(self):
+        self.assertEqual(_frame(protocol.Opcodes.BETS_RECV_SUCCESS, b''), protocol.BetsRecvSuccess().to_bytes())
+
+    def test_winners_to_bytes_must_keep_documents(self):
+        expected = _frame(protocol.Opcodes.WINNERS, struct.pack('<i', 2) + _string('10000000') + _string('10000001'))
+        self.assertEqual(expected, protocol.Winners(['10000000', '10000001']).to_bytes())
+
+    def test_winners_to_bytes_must_prefix_utf8_length(self):
+        expected = _frame(protocol.Opcodes.WINNERS, struct.pack('<i', 1) + _string('ñandú'))
+        self.assertEqual(expected, protocol.Winners(['ñandú']).to_bytes())
+
+    def test_winners_to_buffers_must_join_into_to_bytes(self):
+        for count in (1, protocol.SCATTER_MIN_WINNERS, 3 * protocol.SCATTER_MIN_WINNERS):
+            winners = protocol.Winners([str(10000000 + i) for i in range(count)])
+            self.assertEqual(winners.to_bytes(), b''.join(winners.to_buffers()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import os
+import threading
+import unittest
+
+from app import service
+from app.protocol import RawBet
+from common.utils import LOTTERY_WINNER_NUMBER, STORAGE_FILEPATH, Bet, load_bets, store_bets
+
+
+class TestBetsWriter(unittest.TestCase):
+
+    def tearDown(self):
+        if os.path.exists(STORAGE_FILEPATH):
+            os.remove(STORAGE_FILEPATH)
+
+    def test_invalid_batch_must_fail_alone_and_keep_order(self):
+        results = []
+        done = threading.Event()
+        writer = service.BetsWriter()
+        writer.start()
+        writer.submit([RawBet('1', 'first', 'last', '10000000', '2000-12-20', '7500')], results.append)
+        writer.submit([RawBet('2', 'first', 'last', '10000001', '2000-12-20', 'x')], results.append)
+        writer.submit([RawBet('3', 'first', 'last', '10000002', '2000-12-20', '7574')], results.append)
+        writer.submit([], lambda _: done.set())
+        self.assertTrue(done.wait(5))
+        writer.close()
+
+        self.assertIsNone(results[0])
+        self.assertIsInstance(results[1], ValueError)
+        self.assertIsNone(results[2])
+        self.assertEqual(['10000000', '10000002'], [b.document for b in load_bets()])
+
+
+class TestComputeWinners(unittest.TestCase):
+
+    def tearDown(self):
+        if os.path.exists(STORAGE_FILEPATH):
+            os.remove(STORAGE_FILEPATH)
+
+    def test_compute_winners_must_group_documents_by_agency(self):
+        store_bets([
+            Bet('1', 'first', 'last', '10000000', '2000-12-20', LOTTERY_WINNER_NUMBER),
+            Bet('1', 'first, "quoted"', 'last', '10000001', '2000-12-20', LOTTERY_WINNER_NUMBER),
+            Bet('2', 'first', 'last', '10000002', '2000-12-20', LOTTERY_WINNER_NUMBER + 10000),
+            Bet('3', 'first', 'last', '10000003', '2000-12-20', LOTTERY_WINNER_NUMBER),
+        ])
+
+        self.assertEqual({1: ['10000000', '10000001'], 3: ['10000003']}, service.compute_winners())
+
+    def test_compute_winners_must_keep_multiline_fields_in_one_row(self):
+        store_bets([
+            Bet('1', 'a\nb', 'last', '10000000', '2000-12-20', LOTTERY_WINNER_NUMBER),
+            Bet('2', 'first', f'x,{LOTTERY_WINNER_NUMBER}\ny', '10000001', '2000-12-20', 1),
+        ])
+
+        self.assertEqual({1: ['10000000']}, service.compute_winners())
+
+
+if __name__ == '__main__':
+    unittest.main()